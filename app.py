@@ -1,9 +1,12 @@
-import os, io, re, zipfile, shutil, tempfile, traceback
-from datetime import datetime
-from PIL import Image, ImageDraw, ImageFont
-import numpy as np
-import cv2
+import traceback
+from contextlib import ExitStack
 import streamlit as st
+from file_queue import FileQueue
+from processing import (
+    get_strip_mapping, parse_multi_numbering, parse_skip_images, pdf_output, render,
+    sanitize_filename, zip_output,
+)
+from result_store import ResultStore, result_key
 
 # ------------------- PAGE CONFIG -------------------
 st.set_page_config(
@@ -172,10 +175,20 @@ st.markdown("""
 
 # ------------------- SESSION STATE -------------------
 if 'uploaded_files' not in st.session_state:
-    st.session_state.uploaded_files = []
+    st.session_state.uploaded_files = FileQueue()
+if 'queue_page' not in st.session_state:
+    st.session_state.queue_page = 0
 if 'processed_files' not in st.session_state:
     st.session_state.processed_files = []
 
+# Defaults used when the settings panel is hidden
+exam_type = exam_date = ""
+alignment = "Center"
+extra_alignments = []
+strip_q1 = strip_q2 = strip_q3 = ""
+ratio_val1 = ratio_val2 = ratio_val3 = 0.2
+multi_numbering_input = skip_numbering_input = ""
+
 # ------------------- SIDEBAR -------------------
 if st.session_state.sidebar_visible:
     with st.sidebar:
@@ -202,6 +215,11 @@ if st.session_state.sidebar_visible:
             index=0,
             help="Position images on the page"
         )
+        extra_alignments = st.multiselect(
+            "Additional PDF Alignments",
+            ["Center", "Left", "Right"],
+            help="Extra PDF versions produced by 'Generate All Outputs' from the same processing run"
+        )
         
         st.markdown('<div class="section-header">✂️ STRIP CROPPING SETTINGS</div>', unsafe_allow_html=True)
         
@@ -299,12 +317,8 @@ if uploaded_files:
             new_files_count = 0
             for uploaded_file in uploaded_files:
                 # Check if file already exists
-                if not any(f['name'] == uploaded_file.name for f in st.session_state.uploaded_files):
-                    st.session_state.uploaded_files.append({
-                        'name': uploaded_file.name,
-                        'bytes': uploaded_file.read(),
-                        'batch': len(st.session_state.uploaded_files) // 10 + 1
-                    })
+                if uploaded_file.name not in st.session_state.uploaded_files:
+                    st.session_state.uploaded_files.add(uploaded_file.name, uploaded_file.read())
                     new_files_count += 1
             
             if new_files_count > 0:
@@ -315,353 +329,156 @@ if uploaded_files:
     
     with col2:
         if st.button("🗑️ **CLEAR PROCESSING QUEUE**", use_container_width=True, type="secondary"):
-            st.session_state.uploaded_files = []
+            st.session_state.uploaded_files.clear()
             st.session_state.processed_files = []
+            st.session_state.queue_page = 0
             st.success("✅ Processing queue cleared successfully")
             st.rerun()
 
 # Display uploaded files with batch numbers
-if st.session_state.uploaded_files:
-    st.markdown(f"### 📋 PROCESSING QUEUE ({len(st.session_state.uploaded_files)} images)")
+BATCHES_PER_PAGE = 5
+
+def set_queue_page(page):
+    st.session_state.queue_page = page
+
+# Fragments: interacting with the queue or the processing buttons only reruns
+# that part of the page instead of the whole script.
+@st.fragment
+def render_queue():
+    queue = st.session_state.uploaded_files
+    st.markdown(f"### 📋 PROCESSING QUEUE ({len(queue)} images)")
     
-    # Show by batches
-    batches = {}
-    for file_info in st.session_state.uploaded_files:
-        batch_num = file_info['batch']
-        if batch_num not in batches:
-            batches[batch_num] = []
-        batches[batch_num].append(file_info['name'])
+    # Only one page of batches is rendered per run
+    batch_numbers = queue.batch_numbers()
+    page_count = (len(batch_numbers) - 1) // BATCHES_PER_PAGE + 1
+    page = min(st.session_state.queue_page, page_count - 1)
     
-    for batch_num, files in sorted(batches.items()):
+    col1, col2, col3, col4 = st.columns([1, 2, 1, 2])
+    with col1:
+        st.button("◀ Prev", key="queue_prev", disabled=page == 0,
+                  on_click=set_queue_page, args=(page - 1,))
+    with col2:
+        st.markdown(f"Page **{page + 1}** of **{page_count}**")
+    with col3:
+        st.button("Next ▶", key="queue_next", disabled=page >= page_count - 1,
+                  on_click=set_queue_page, args=(page + 1,))
+    with col4:
+        show_thumbnails = st.toggle("Show thumbnails", key="queue_thumbnails")
+    
+    for batch_num in batch_numbers[page * BATCHES_PER_PAGE:(page + 1) * BATCHES_PER_PAGE]:
+        files = queue.batch_entries(batch_num)
         with st.expander(f"📦 **Batch {batch_num}** ({len(files)} images)", expanded=True):
-            for file_name in files:
-                st.markdown(f'<div class="selected-file">📄 {file_name}</div>', unsafe_allow_html=True)
+            if show_thumbnails:
+                thumbs = [(queue.thumbnail(f['id']), f['name']) for f in files]
+                thumbs = [(thumb, name) for thumb, name in thumbs if thumb is not None]
+                if thumbs:
+                    st.image([thumb for thumb, _ in thumbs], caption=[name for _, name in thumbs])
+            else:
+                # One element per batch rather than one per file
+                st.markdown("".join(f'<div class="selected-file">📄 {f["name"]}</div>' for f in files),
+                            unsafe_allow_html=True)
             
             # Remove batch button
             col1, col2 = st.columns([3, 1])
             with col2:
                 if st.button(f"Remove Batch {batch_num}", key=f"remove_batch_{batch_num}"):
-                    st.session_state.uploaded_files = [f for f in st.session_state.uploaded_files if f['batch'] != batch_num]
+                    queue.remove_batch(batch_num)
                     st.success(f"✅ Batch {batch_num} removed from processing queue")
                     st.rerun()
 
-# ------------------- HELPER FUNCTIONS -------------------
-def enhance_image_opencv(pil_img):
-    img_cv = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
-    gray = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
-    denoised = cv2.fastNlMeansDenoising(gray, h=10)
-    thresh = cv2.adaptiveThreshold(denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 29, 17)
-    kernel = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]])
-    sharpened = cv2.filter2D(thresh, -1, kernel)
-    return Image.fromarray(cv2.cvtColor(sharpened, cv2.COLOR_GRAY2RGB))
-
-def natural_sort_key(s):
-    return [int(text) if text.isdigit() else text.lower() for text in re.split(r'(\d+)', s)]
-
-def parse_qnos(qnos_str):
-    q_list = []
-    if not qnos_str:
-        return q_list
-    for part in qnos_str.split(','):
-        part = part.strip()
-        if '-' in part:
-            start, end = map(int, part.split('-'))
-            q_list.extend(range(start, end + 1))
-        elif part:
-            q_list.append(int(part))
-    return q_list
-
-def parse_multi_numbering(input_str):
-    numbering_map = {}
-    if not input_str:
-        return numbering_map
-    for part in input_str.split(','):
-        part = part.strip()
-        if ':' in part:
-            img_range, start_num = part.split(':')
-            try:
-                start_num = int(start_num)
-            except ValueError:
-                continue
-            if '-' in img_range:
-                start_idx, end_idx = map(int, img_range.split('-'))
-                for i, idx in enumerate(range(start_idx, end_idx + 1)):
-                    numbering_map[idx] = start_num + i
-            else:
-                idx = int(img_range)
-                numbering_map[idx] = start_num
-    return numbering_map
-
-def parse_skip_images(skip_str):
-    skip_list = []
-    if not skip_str:
-        return skip_list
-    for part in skip_str.split(','):
-        part = part.strip()
-        if '-' in part:
-            start, end = map(int, part.split('-'))
-            skip_list.extend(range(start, end + 1))
-        elif part:
-            skip_list.append(int(part))
-    return skip_list
-
-def sanitize_filename(name):
-    cleaned_name = re.sub(r'[^À-῿Ⰰ-퟿豈-﷏\uFDF0-\uFFFD\w\s.-]', '_', name)
-    cleaned_name = re.sub(r'\s+', '_', cleaned_name)
-    cleaned_name = cleaned_name.strip('_')
-    if not cleaned_name:
-        return "untitled"
-    return cleaned_name
-
-def get_strip_mapping():
-    mapping = {}
-    if strip_q1:
-        for q in parse_qnos(strip_q1):
-            mapping[q] = ratio_val1
-    if strip_q2:
-        for q in parse_qnos(strip_q2):
-            mapping[q] = ratio_val2
-    if strip_q3:
-        for q in parse_qnos(strip_q3):
-            mapping[q] = ratio_val3
-    return mapping
-
-def load_font_with_size(size):
-    try:
-        font_paths = [
-            "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
-            "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
-            "arial.ttf",
-        ]
-        for font_path in font_paths:
-            try:
-                return ImageFont.truetype(font_path, size)
-            except:
-                continue
-        return ImageFont.load_default()
-    except:
-        return ImageFont.load_default()
-
-# ------------------- PDF GENERATION -------------------
-def create_pdf(files):
-    try:
-        A4_WIDTH, A4_HEIGHT = int(8.27 * 300), int(11.69 * 300)
-        TOP_MARGIN_FIRST_PAGE, TOP_MARGIN_SUBSEQUENT_PAGES = 125, 110
-        BOTTOM_MARGIN = 105
-        GAP_BETWEEN_IMAGES = 20
-        OVERLAP_PIXELS = 25
-        WATERMARK_TEXT = "LFJC"
-        WATERMARK_OPACITY = int(255 * 0.20)
-        WATERMARK_ANGLE = 45
-
-        pdf_pages = []
-        
-        header_font = load_font_with_size(60)
-        subheader_font = load_font_with_size(45)
-        question_font = load_font_with_size(40)
-        page_number_font = load_font_with_size(30)
-        watermark_font = load_font_with_size(800)
-
-        strip_mapping = get_strip_mapping()
-        numbering_map = parse_multi_numbering(multi_numbering_input)
-        skip_list = parse_skip_images(skip_numbering_input)
-
-        current_page = Image.new('RGB', (A4_WIDTH, A4_HEIGHT), (255, 255, 255))
-        y_offset = TOP_MARGIN_FIRST_PAGE
-
-        draw_header = ImageDraw.Draw(current_page)
-        college_name = "LITTLE FLOWER JUNIOR COLLEGE, UPPAL, HYD-39"
-        
-        try:
-            bbox = draw_header.textbbox((0, 0), college_name, font=header_font)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-            draw_header.text(((A4_WIDTH - text_width) // 2, y_offset), 
-                           college_name, fill="black", font=header_font)
-            y_offset += text_height + 10
-        except:
-            draw_header.text((A4_WIDTH // 4, y_offset), college_name, 
-                           fill="black", font=header_font)
-            y_offset += 80
-
-        combined_header = f"{exam_type}   {exam_date}"
-        try:
-            bbox = draw_header.textbbox((0, 0), combined_header, font=subheader_font)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-            draw_header.text(((A4_WIDTH - text_width) // 2, y_offset), 
-                           combined_header, fill="black", font=subheader_font)
-            y_offset += text_height + 40
-        except:
-            draw_header.text((A4_WIDTH // 3, y_offset), combined_header, 
-                           fill="black", font=subheader_font)
-            y_offset += 60
-
-        image_index = 1
-        question_number_counter = 0
-
-        # Sort files naturally
-        files.sort(key=lambda x: natural_sort_key(x['name']))
-
-        for file_info in files:
-            question_number_to_display = None
-            if image_index in numbering_map:
-                question_number_to_display = numbering_map[image_index]
-            elif image_index not in skip_list:
-                question_number_counter += 1
-                question_number_to_display = question_number_counter
-            else:
-                image_index += 1
-                continue
-            
-            try:
-                img = Image.open(io.BytesIO(file_info['bytes'])).convert('RGB')
-                img = enhance_image_opencv(img)
-                
-                # Scale image based on alignment choice
-                if alignment == "Center":
-                    # Scale to 90% of page width for centered images
-                    scale = (A4_WIDTH * 0.9) / img.width
-                else:  # Left or Right alignment
-                    # Use smaller scale to leave space on sides
-                    SIDE_MARGIN = 50
-                    scale = ((A4_WIDTH - SIDE_MARGIN) * 0.9) / img.width
-                
-                img_scaled = img.resize(
-                    (int(img.width * scale), int(img.height * scale)), 
-                    Image.Resampling.LANCZOS
-                )
-                img_to_process = img_scaled
-                is_first_part = True
-
-                while img_to_process:
-                    remaining_space = A4_HEIGHT - y_offset - BOTTOM_MARGIN
-                    if img_to_process.height <= remaining_space:
-                        img_part = img_to_process
-                        img_to_process = None
-                    else:
-                        split_height = remaining_space + OVERLAP_PIXELS
-                        img_part = img_to_process.crop((0, 0, img_to_process.width, split_height))
-                        img_to_process = img_to_process.crop(
-                            (0, split_height - OVERLAP_PIXELS, 
-                             img_to_process.width, img_to_process.height)
-                        )
-
-                    draw_img = ImageDraw.Draw(img_part)
-
-                    fraction = strip_mapping.get(question_number_to_display, None)
-                    if fraction is not None:
-                        strip_width = int(img_part.width * fraction)
-                        draw_img.rectangle(
-                            [(0, 0), (strip_width, img_part.height)], 
-                            fill=(255, 255, 255)
-                        )
-
-                    if is_first_part and question_number_to_display is not None:
-                        try:
-                            bbox = draw_img.textbbox(
-                                (0, 0), f"{question_number_to_display}.", 
-                                font=question_font
-                            )
-                            text_width_q = bbox[2] - bbox[0]
-                            text_height_q = bbox[3] - bbox[1]
-                            text_x = (strip_width - text_width_q - 10) if fraction is not None else 10
-                            draw_img.text(
-                                (text_x, 10), f"{question_number_to_display}.", 
-                                font=question_font, fill="black"
-                            )
-                        except:
-                            draw_img.text(
-                                (10, 10), f"{question_number_to_display}.", 
-                                font=question_font, fill="black"
-                            )
-                        is_first_part = False
-
-                    # Place image based on alignment choice
-                    if alignment == "Center":
-                        x_position = (A4_WIDTH - img_part.width) // 2
-                    elif alignment == "Left":
-                        x_position = 50  # 50px left margin
-                    else:  # Right alignment
-                        x_position = A4_WIDTH - img_part.width - 50  # 50px right margin
-                    
-                    current_page.paste(img_part, (x_position, y_offset))
-                    
-                    y_offset += img_part.height + GAP_BETWEEN_IMAGES
-
-                    if img_to_process:
-                        pdf_pages.append(current_page)
-                        current_page = Image.new('RGB', (A4_WIDTH, A4_HEIGHT), (255, 255, 255))
-                        y_offset = TOP_MARGIN_SUBSEQUENT_PAGES
-
-                image_index += 1
-
-            except Exception as e:
-                st.error(f"Error processing {file_info['name']}: {e}")
-                continue
-
-        pdf_pages.append(current_page)
-
-        for i, page in enumerate(pdf_pages):
-            watermark_img = Image.new('RGBA', (A4_WIDTH, A4_HEIGHT), (0, 0, 0, 0))
-            draw_wm = ImageDraw.Draw(watermark_img)
-            
-            try:
-                bbox = draw_wm.textbbox((0, 0), WATERMARK_TEXT, font=watermark_font)
-                text_width = bbox[2] - bbox[0]
-                text_height = bbox[3] - bbox[1]
-                
-                text_temp = Image.new('RGBA', (text_width, text_height), (0, 0, 0, 0))
-                draw_temp = ImageDraw.Draw(text_temp)
-                draw_temp.text((-bbox[0], -bbox[1]), WATERMARK_TEXT, 
-                             font=watermark_font, fill=(0, 0, 0, WATERMARK_OPACITY))
-                
-                rotated_text = text_temp.rotate(WATERMARK_ANGLE, expand=1)
-                rotated_width, rotated_height = rotated_text.size
-                
-                paste_x = (A4_WIDTH - rotated_width) // 2
-                paste_y = (A4_HEIGHT - rotated_height) // 2
-                
-                page.paste(rotated_text, (paste_x, paste_y), rotated_text)
-            except:
-                draw_page = ImageDraw.Draw(page)
-                draw_page.text((A4_WIDTH//3, A4_HEIGHT//2), WATERMARK_TEXT, 
-                             fill=(200, 200, 200, 100), font=watermark_font)
-
-            if i > 0:
-                try:
-                    draw_page_num = ImageDraw.Draw(page)
-                    page_number_text = str(i + 1)
-                    bbox_pn = draw_page_num.textbbox((0, 0), page_number_text, font=page_number_font)
-                    text_width_pn = bbox_pn[2] - bbox_pn[0]
-                    text_height_pn = bbox_pn[3] - bbox_pn[1]
-                    page_num_x = (A4_WIDTH - text_width_pn) // 2
-                    page_num_y = A4_HEIGHT - BOTTOM_MARGIN + (BOTTOM_MARGIN - text_height_pn) // 2 - 20
-                    draw_page_num.text((page_num_x, page_num_y), page_number_text, 
-                                     font=page_number_font, fill="black")
-                except:
-                    draw_page_num = ImageDraw.Draw(page)
-                    draw_page_num.text((A4_WIDTH//2, A4_HEIGHT - 50), str(i + 1), 
-                                     fill="black", font=page_number_font)
-
-        pdf_buffer = io.BytesIO()
-        pdf_pages[0].save(pdf_buffer, format='PDF', save_all=True, 
-                         append_images=pdf_pages[1:], resolution=300.0)
-        pdf_buffer.seek(0)
-        
-        return pdf_buffer.getvalue()
-
-    except Exception as e:
-        st.error(f"PDF Creation Error: {str(e)}")
-        traceback.print_exc()
-        return None
+if st.session_state.uploaded_files:
+    render_queue()
 
 # ------------------- GENERATE BUTTONS -------------------
-st.markdown("---")
-st.markdown("### 🚀 PROCESSING OPTIONS")
-
-if st.session_state.uploaded_files:
-    col1, col2, col3 = st.columns(3)
+# Bump when a change to processing.py alters generated output, so stored
+# results from the previous version are not served.
+RESULT_VERSION = 1
+
+@st.cache_resource
+def get_result_store():
+    return ResultStore()
+
+def report_file_error(name, e):
+    st.error(f"Error processing {name}: {e}")
+
+def parse_numbering_settings(settings):
+    return (get_strip_mapping(settings['strips']),
+            parse_multi_numbering(settings['multi_numbering']),
+            parse_skip_images(settings['skip_numbering']))
+
+def ensure_results(store, files, fingerprint, settings, variants, on_error):
+    # variants: list of ('pdf', alignment) / ('zip', None). Returns (key, meta) per
+    # variant. Results already in the store are reused; the rest are rendered
+    # together in one pass, straight to disk. Uses no Streamlit commands, so a
+    # download button can call it again after its result has expired.
+    strip_mapping, numbering_map, skip_list = parse_numbering_settings(settings)
+    exam_type, exam_date = settings['exam_type'], settings['exam_date']
+
+    common = (RESULT_VERSION, fingerprint, tuple(sorted(strip_mapping.items())),
+              tuple(sorted(numbering_map.items())), tuple(sorted(skip_list)))
+    keys = [result_key(*common, kind, exam_type, exam_date, alignment) if kind == 'pdf'
+            else result_key(*common, kind) for kind, alignment in variants]
+    metas = [store.lookup(key) for key in keys]
+
+    missing = [i for i, meta in enumerate(metas) if meta is None]
+    if missing:
+        errors = []
+        def collect_error(name, e):
+            errors.append((name, str(e)))
+            on_error(name, e)
+
+        with ExitStack() as stack:
+            outputs = []
+            for i in missing:
+                fp, metas[i] = stack.enter_context(store.create(keys[i], errors=errors))
+                kind, alignment = variants[i]
+                if kind == 'pdf':
+                    outputs.append(pdf_output(fp, exam_type, exam_date, alignment, strip_mapping))
+                else:
+                    outputs.append(zip_output(fp, strip_mapping))
+            counts = render(files, outputs, numbering_map, skip_list, on_error=collect_error)
+            for i, count in zip(missing, counts):
+                metas[i]['count'] = count
+
+    return list(zip(keys, metas))
+
+def produce_results(settings, variants):
+    # Returns (download data callable, meta) per variant
+    store = get_result_store()
+    queue = st.session_state.uploaded_files
+    # Snapshot, so a regenerated result matches its key even if the queue changes later
+    files, fingerprint = list(queue), queue.fingerprint()
+
+    reported = set()
+    def report_once(name, e):
+        reported.add(name)
+        report_file_error(name, e)
+
+    results = ensure_results(store, files, fingerprint, settings, variants, report_once)
+
+    # Replay per-file errors for results served from the store
+    for _, meta in results:
+        for name, message in meta['errors']:
+            if name not in reported:
+                reported.add(name)
+                st.error(f"Error processing {name}: {message}")
+
+    def regenerate(variant):
+        return lambda: ensure_results(store, files, fingerprint, settings, [variant],
+                                      on_error=lambda name, e: None)
+
+    return [(store.reader(key, regenerate(variant)), meta)
+            for variant, (key, meta) in zip(variants, results)]
+
+@st.fragment
+def render_processing_options(settings):
+    if not st.session_state.uploaded_files:
+        st.info("📤 Upload answer sheet images and add them to the processing queue to begin")
+        return
+
+    exam_type, exam_date = settings['exam_type'], settings['exam_date']
+
+    col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         if st.button("📄 **GENERATE PDF DOCUMENT**", use_container_width=True, type="primary"):
@@ -671,9 +488,8 @@ if st.session_state.uploaded_files:
                     st.info("📝 Click the ☰ button in the top-left corner to open settings panel")
             else:
                 with st.spinner(f"🔨 Processing {len(st.session_state.uploaded_files)} images into PDF..."):
-                    pdf_data = create_pdf(st.session_state.uploaded_files)
-                    
-                    if pdf_data:
+                    try:
+                        (pdf_data, pdf_meta), = produce_results(settings, [('pdf', settings['alignment'])])
                         filename = f"{sanitize_filename(exam_type)}_{sanitize_filename(exam_date)}_processed.pdf"
                         st.success(f"✅ PDF document created successfully!")
                         
@@ -685,99 +501,103 @@ if st.session_state.uploaded_files:
                                 file_name=filename,
                                 mime="application/pdf",
                                 type="primary",
+                                on_click="ignore",
                                 use_container_width=True
                             )
                         with col_d2:
-                            st.metric("Pages", len(pdf_data) // 50000)  # Rough estimate
-                    else:
-                        st.error("❌ Failed to create PDF document")
+                            st.metric("Pages", pdf_meta['count'])
+                    except Exception as e:
+                        st.error(f"PDF Creation Error: {str(e)}")
+                        traceback.print_exc()
     
     with col2:
         # Create ZIP of processed images
         if st.button("🗃️ **EXPORT PROCESSED IMAGES**", use_container_width=True, type="secondary"):
             with st.spinner("🔨 Creating archive of processed images..."):
                 try:
-                    # Create processed images
-                    temp_dir = tempfile.mkdtemp()
-                    processed_files = []
-                    
-                    strip_mapping = get_strip_mapping()
-                    numbering_map = parse_multi_numbering(multi_numbering_input)
-                    skip_list = parse_skip_images(skip_numbering_input)
-                    
-                    image_index = 1
-                    question_number_counter = 0
-                    
-                    for file_info in st.session_state.uploaded_files:
-                        question_number_to_display = None
-                        if image_index in numbering_map:
-                            question_number_to_display = numbering_map[image_index]
-                        elif image_index not in skip_list:
-                            question_number_counter += 1
-                            question_number_to_display = question_number_counter
-                        
-                        if question_number_to_display:
-                            try:
-                                img = Image.open(io.BytesIO(file_info['bytes'])).convert('RGB')
-                                img = enhance_image_opencv(img)
-                                
-                                # Apply strip cropping
-                                strip_fraction = strip_mapping.get(question_number_to_display)
-                                if strip_fraction is not None and strip_fraction > 0:
-                                    original_width = img.width
-                                    crop_width = int(original_width * (1 - strip_fraction))
-                                    img = img.crop((original_width - crop_width, 0, original_width, img.height))
-                                
-                                # Save processed image
-                                filename = f"Q{question_number_to_display:03d}.png"
-                                filepath = os.path.join(temp_dir, filename)
-                                img.save(filepath, "PNG", quality=95)
-                                processed_files.append(filepath)
-                                
-                            except Exception as e:
-                                st.error(f"Error processing {file_info['name']}: {e}")
-                        
-                        image_index += 1
-                    
-                    # Create ZIP
-                    zip_buffer = io.BytesIO()
-                    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                        for filepath in processed_files:
-                            zipf.write(filepath, os.path.basename(filepath))
-                    
-                    zip_buffer.seek(0)
+                    (zip_data, zip_meta), = produce_results(settings, [('zip', None)])
                     zip_filename = f"{sanitize_filename(exam_type)}_{sanitize_filename(exam_date)}_processed_images.zip"
                     
-                    st.success(f"✅ Archive created with {len(processed_files)} processed images!")
+                    st.success(f"✅ Archive created with {zip_meta['count']} processed images!")
                     
                     col_z1, col_z2 = st.columns([3, 1])
                     with col_z1:
                         st.download_button(
                             label="📥 **DOWNLOAD IMAGE ARCHIVE**",
-                            data=zip_buffer,
+                            data=zip_data,
                             file_name=zip_filename,
                             mime="application/zip",
                             type="secondary",
+                            on_click="ignore",
                             use_container_width=True
                         )
                     with col_z2:
-                        st.metric("Images", len(processed_files))
-                    
-                    # Cleanup
-                    shutil.rmtree(temp_dir, ignore_errors=True)
+                        st.metric("Images", zip_meta['count'])
                     
                 except Exception as e:
                     st.error(f"Archive Creation Error: {str(e)}")
     
     with col3:
+        # PDF in every selected alignment plus the image archive, from one processing run
+        if st.button("🧩 **GENERATE ALL OUTPUTS**", use_container_width=True, type="secondary"):
+            if not exam_type or not exam_date:
+                st.error("❌ Please enter exam details in the settings panel!")
+            else:
+                alignments = [settings['alignment']] + [a for a in settings['extra_alignments']
+                                                        if a != settings['alignment']]
+                with st.spinner(f"🔨 Processing {len(st.session_state.uploaded_files)} images into "
+                                f"{len(alignments)} PDF(s) and an image archive..."):
+                    try:
+                        *pdf_results, (zip_data, zip_meta) = produce_results(
+                            settings, [('pdf', a) for a in alignments] + [('zip', None)]
+                        )
+                        base_name = f"{sanitize_filename(exam_type)}_{sanitize_filename(exam_date)}"
+                        
+                        st.success(f"✅ Created {len(pdf_results)} PDF(s) and an archive of {zip_meta['count']} images!")
+                        for a, (pdf_data, pdf_meta) in zip(alignments, pdf_results):
+                            suffix = "" if a == settings['alignment'] else f"_{a.lower()}"
+                            st.download_button(
+                                label=f"📥 **PDF ({a.upper()}, {pdf_meta['count']} pages)**",
+                                data=pdf_data,
+                                file_name=f"{base_name}_processed{suffix}.pdf",
+                                mime="application/pdf",
+                                key=f"download_all_pdf_{a}",
+                                on_click="ignore",
+                                use_container_width=True
+                            )
+                        st.download_button(
+                            label="📥 **IMAGE ARCHIVE**",
+                            data=zip_data,
+                            file_name=f"{base_name}_processed_images.zip",
+                            mime="application/zip",
+                            key="download_all_zip",
+                            on_click="ignore",
+                            use_container_width=True
+                        )
+                    except Exception as e:
+                        st.error(f"Output Creation Error: {str(e)}")
+                        traceback.print_exc()
+    
+    with col4:
         if st.button("⚙️ **PROCESSING SETTINGS**", use_container_width=True, type="secondary"):
             if not st.session_state.sidebar_visible:
                 st.session_state.sidebar_visible = True
                 st.rerun()
             else:
                 st.info("📝 Settings panel is already open on the left side")
-else:
-    st.info("📤 Upload answer sheet images and add them to the processing queue to begin")
+
+st.markdown("---")
+st.markdown("### 🚀 PROCESSING OPTIONS")
+
+render_processing_options({
+    'exam_type': exam_type,
+    'exam_date': exam_date,
+    'alignment': alignment,
+    'extra_alignments': extra_alignments,
+    'strips': ((strip_q1, ratio_val1), (strip_q2, ratio_val2), (strip_q3, ratio_val3)),
+    'multi_numbering': multi_numbering_input,
+    'skip_numbering': skip_numbering_input,
+})
 
 # ------------------- COPYRIGHT FOOTER -------------------
 st.markdown("---")
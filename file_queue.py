@@ -0,0 +1,107 @@
+import io
+import hashlib
+from collections import OrderedDict
+from itertools import count
+from PIL import Image
+
+# Processing queue kept in st.session_state. Entries are plain dicts with
+# 'id', 'name', 'bytes', 'digest' and 'batch' keys, so they can be handed
+# straight to the functions in processing.py. Queue order is only used for
+# display; outputs are always numbered in natural filename order.
+
+BATCH_SIZE = 10
+THUMBNAIL_SIZE = (160, 160)
+
+
+class FileQueue:
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self._ids = count(1)
+        self._entries = OrderedDict()   # id -> entry, in queue order
+        self._by_name = {}              # name -> id
+        self._batches = {}              # batch number -> OrderedDict of ids (ordered set)
+        self._thumbnails = {}           # id -> PNG bytes, filled on demand
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(list(self._entries.values()))
+
+    def __contains__(self, name):
+        return name in self._by_name
+
+    def add(self, name, data):
+        # Returns the new entry id, or None if a file with this name is queued
+        if name in self._by_name:
+            return None
+        entry_id = next(self._ids)
+        batch_num = self._open_batch()
+        self._entries[entry_id] = {'id': entry_id, 'name': name, 'bytes': data, 'batch': batch_num,
+                                   'digest': hashlib.blake2b(data, digest_size=16).hexdigest()}
+        self._by_name[name] = entry_id
+        self._batches.setdefault(batch_num, OrderedDict())[entry_id] = None
+        return entry_id
+
+    def _open_batch(self):
+        # Fill the highest-numbered batch, start a new one once it is full.
+        # Batch numbers never change after insert, so removing a batch leaves a gap.
+        if not self._batches:
+            return 1
+        last = max(self._batches)
+        if len(self._batches[last]) < self.batch_size:
+            return last
+        return last + 1
+
+    def remove(self, entry_id):
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return None
+        del self._by_name[entry['name']]
+        self._thumbnails.pop(entry_id, None)
+        members = self._batches[entry['batch']]
+        del members[entry_id]
+        if not members:
+            del self._batches[entry['batch']]
+        return entry
+
+    def remove_batch(self, batch_num):
+        for entry_id in list(self._batches.get(batch_num, ())):
+            self.remove(entry_id)
+
+    def clear(self):
+        self._entries.clear()
+        self._by_name.clear()
+        self._batches.clear()
+        self._thumbnails.clear()
+
+    def fingerprint(self):
+        # Identifies the queue contents independently of queue order
+        h = hashlib.blake2b(digest_size=16)
+        for name, digest in sorted((e['name'], e['digest']) for e in self._entries.values()):
+            h.update(f"{name}\0{digest}\0".encode())
+        return h.hexdigest()
+
+    def batch_numbers(self):
+        return sorted(self._batches)
+
+    def batch_entries(self, batch_num):
+        return [self._entries[entry_id] for entry_id in self._batches.get(batch_num, ())]
+
+    def thumbnail(self, entry_id):
+        # Small greyscale PNG, generated the first time the entry is shown.
+        # Returns None for files that cannot be decoded.
+        thumb = self._thumbnails.get(entry_id)
+        if thumb is None:
+            try:
+                img = Image.open(io.BytesIO(self._entries[entry_id]['bytes']))
+                img.draft('L', THUMBNAIL_SIZE)  # lets JPEG decode at reduced scale
+                img = img.convert('L')
+                img.thumbnail(THUMBNAIL_SIZE)
+                buffer = io.BytesIO()
+                img.save(buffer, format='PNG')
+                thumb = buffer.getvalue()
+            except Exception:
+                thumb = b''
+            self._thumbnails[entry_id] = thumb
+        return thumb or None
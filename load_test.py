@@ -0,0 +1,231 @@
+import os, sys, gc, json, time, shutil, argparse, tempfile, threading, traceback
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import cv2
+import streamlit.logger
+import result_store
+from streamlit.testing.v1 import AppTest
+
+# Concurrent-session load test for app.py. Each simulated teacher is a
+# Streamlit AppTest session driven through the real workflow:
+#   open app -> fill exam details -> upload -> add to queue -> generate PDF -> export ZIP
+# All sessions run in this one process, as they would on the Streamlit server,
+# so they share its CPU, memory and cached resources.
+#
+#   python load_test.py --sessions 1,5,20 --images 20
+#   python load_test.py --sessions 10 --image-dir /path/to/sample/scans --json report.json
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+STEPS = ["open", "settings", "upload", "add_to_queue", "generate_pdf", "export_zip"]
+RSS_SAMPLE_INTERVAL = 0.05
+
+
+# ------------------- INPUT IMAGES -------------------
+def synthetic_scans(count, width, height, seed=0):
+    # Noisy grey "answer sheets" with handwriting-like strokes
+    rng = np.random.default_rng(seed)
+    scans = []
+    for i in range(count):
+        img = np.full((height, width), 235, np.uint8)
+        for line in range(height // 120):
+            y = 80 + line * 110
+            cv2.putText(img, f"Q{i + 1} answer line {line + 1}", (60, y),
+                        cv2.FONT_HERSHEY_SCRIPT_SIMPLEX, 2.0, 30, 3)
+        img = np.clip(img + rng.normal(0, 12, img.shape), 0, 255).astype(np.uint8)
+        ok, jpg = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        scans.append((f"scan_{i + 1:03d}.jpg", jpg.tobytes(), "image/jpeg"))
+    return scans
+
+def scans_from_dir(path):
+    scans = []
+    for name in sorted(os.listdir(path)):
+        ext = os.path.splitext(name)[1].lower()
+        if ext in ('.png', '.jpg', '.jpeg'):
+            with open(os.path.join(path, name), 'rb') as f:
+                scans.append((name, f.read(), "image/png" if ext == '.png' else "image/jpeg"))
+    return scans
+
+def unique_copy(scans, tag):
+    # Bytes after the JPEG/PNG end marker are ignored by decoders but change the
+    # file digest, so sessions don't get each other's results from the result store
+    trailer = f"load-test-{tag}".encode()
+    return [(name, data + trailer, mime) for name, data, mime in scans]
+
+
+# ------------------- MEASUREMENT -------------------
+def current_rss():
+    # Resident set size in bytes (Linux); 0 where /proc is unavailable
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+class RssSampler:
+    # RSS never shrinks much once the allocator has grown the heap, so the
+    # process-wide peak carries over between levels; report growth over start
+    def __init__(self):
+        self.start = self.peak = current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+    @property
+    def growth(self):
+        return max(0, self.peak - self.start)
+
+def percentile(values, pct):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+# ------------------- SIMULATED SESSION -------------------
+def click(at, label):
+    matches = [b for b in at.button if label in b.label]
+    if not matches:
+        raise RuntimeError(f"button {label!r} not found")
+    matches[0].click()
+
+def check(at, step):
+    if at.exception:
+        raise RuntimeError(f"{step}: {at.exception[0].message}")
+    errors = [e.value for e in at.error]
+    if errors:
+        raise RuntimeError(f"{step}: {errors[0]}")
+
+def run_session(session_id, scans, timeout):
+    # Returns {step: seconds}; raises on the first failed step
+    timings = {}
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+
+    def step(name, action):
+        start = time.perf_counter()
+        action()
+        at.run()
+        timings[name] = time.perf_counter() - start
+        check(at, name)
+
+    step("open", lambda: None)
+
+    def fill_settings():
+        at.text_input[0].input(f"Load test session {session_id}")
+        at.text_input[1].input("01-01-2026")
+    step("settings", fill_settings)
+    step("upload", lambda: at.file_uploader[0].set_value(scans))
+    step("add_to_queue", lambda: click(at, "ADD TO PROCESSING QUEUE"))
+    step("generate_pdf", lambda: click(at, "GENERATE PDF DOCUMENT"))
+    step("export_zip", lambda: click(at, "EXPORT PROCESSED IMAGES"))
+    return timings
+
+def run_level(concurrency, scans, timeout, run_tag):
+    gc.collect()
+    results, failures = [], []
+    with RssSampler() as rss:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            futures = [pool.submit(run_session, i, unique_copy(scans, f"{run_tag}-{concurrency}-{i}"), timeout)
+                       for i in range(concurrency)]
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    failures.append(str(e))
+        wall = time.perf_counter() - start
+
+    report = {
+        'concurrency': concurrency,
+        'sessions_ok': len(results),
+        'sessions_failed': len(failures),
+        'failures': failures,
+        'wall_seconds': wall,
+        'sessions_per_minute': len(results) / wall * 60 if wall else 0.0,
+        'images_per_second': len(results) * len(scans) / wall if wall else 0.0,
+        'peak_rss_mb': rss.peak / 2**20,
+        'rss_growth_mb': rss.growth / 2**20,
+        'steps': {},
+    }
+    for name in STEPS:
+        values = [r[name] for r in results if name in r]
+        report['steps'][name] = {p: percentile(values, int(p[1:])) for p in ('p50', 'p95', 'p99')}
+        report['steps'][name]['max'] = max(values) if values else float('nan')
+    return report
+
+
+# ------------------- REPORT -------------------
+def print_report(report, out=sys.stdout):
+    print(f"\n== {report['concurrency']} concurrent sessions: {report['sessions_ok']} ok, "
+          f"{report['sessions_failed']} failed, {report['wall_seconds']:.1f}s wall, "
+          f"{report['sessions_per_minute']:.1f} sessions/min, {report['images_per_second']:.2f} images/s, "
+          f"RSS +{report['rss_growth_mb']:.0f} MB (peak {report['peak_rss_mb']:.0f} MB)", file=out)
+    print(f"   {'step':<14}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}", file=out)
+    for name, stats in report['steps'].items():
+        print(f"   {name:<14}" + "".join(f"{stats[k]:>8.2f}s" for k in ('p50', 'p95', 'p99', 'max')), file=out)
+    for failure in report['failures'][:5]:
+        print(f"   failed: {failure}", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive N concurrent app.py sessions and report latency, throughput and memory.")
+    parser.add_argument("--sessions", default="1,5,10,20",
+                        help="comma-separated concurrency levels (default: 1,5,10,20)")
+    parser.add_argument("--image-dir", help="folder of sample scans (default: synthetic scans)")
+    parser.add_argument("--images", type=int, default=20, help="synthetic scans per session")
+    parser.add_argument("--size", default="2480x3508", help="synthetic scan size WxH (default: A4 at 300 dpi)")
+    parser.add_argument("--timeout", type=float, default=1800, help="per-step timeout in seconds")
+    parser.add_argument("--json", help="also write the full report to this file")
+    args = parser.parse_args(argv)
+
+    # Bare-mode warnings from the worker threads would drown out the report
+    streamlit.logger.set_log_level("error")
+
+    levels = [int(level) for level in args.sessions.split(',') if level.strip()]
+    if args.image_dir:
+        scans = scans_from_dir(args.image_dir)
+    else:
+        width, height = map(int, args.size.lower().split('x'))
+        scans = synthetic_scans(args.images, width, height)
+    if not scans:
+        print("no scans to upload", file=sys.stderr)
+        return 1
+
+    print(f"{len(scans)} scans per session, {sum(len(d) for _, d, _ in scans) / 2**20:.1f} MB; "
+          f"baseline RSS {current_rss() / 2**20:.0f} MB", flush=True)
+
+    # Keep the generated PDFs and ZIPs out of the real result store
+    result_store.RESULT_DIR = tempfile.mkdtemp(prefix="lfjc_load_test_")
+    run_tag = str(int(time.time()))
+    reports = []
+    try:
+        for concurrency in levels:
+            report = run_level(concurrency, scans, args.timeout, run_tag)
+            print_report(report)
+            reports.append(report)
+    finally:
+        shutil.rmtree(result_store.RESULT_DIR, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'scans_per_session': len(scans), 'levels': reports}, f, indent=2)
+    return 0 if all(r['sessions_failed'] == 0 for r in reports) else 1
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except Exception:
+        traceback.print_exc()
+        sys.exit(1)
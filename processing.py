@@ -0,0 +1,400 @@
+import re, zipfile
+import traceback
+from types import MappingProxyType
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont
+import numpy as np
+import cv2
+
+# Everything in this module is imported once per process. app.py is re-executed
+# by Streamlit on every widget interaction, so anything expensive to define or
+# build (fonts, kernels, parsed settings) lives here instead.
+
+# ------------------- CONSTANTS -------------------
+A4_WIDTH, A4_HEIGHT = int(8.27 * 300), int(11.69 * 300)
+TOP_MARGIN_FIRST_PAGE, TOP_MARGIN_SUBSEQUENT_PAGES = 125, 110
+BOTTOM_MARGIN = 105
+GAP_BETWEEN_IMAGES = 20
+OVERLAP_PIXELS = 25
+SIDE_MARGIN = 50
+WATERMARK_TEXT = "LFJC"
+WATERMARK_OPACITY = int(255 * 0.20)
+WATERMARK_ANGLE = 45
+COLLEGE_NAME = "LITTLE FLOWER JUNIOR COLLEGE, UPPAL, HYD-39"
+
+SHARPEN_KERNEL = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]])
+
+# ------------------- HELPER FUNCTIONS -------------------
+# Scans stay single-channel uint8 NumPy arrays from decode to page composition;
+# PIL is only used for drawing text and at the PDF encoder boundary.
+def decode_gray(data):
+    # EXIF orientation is ignored, matching what PIL's Image.open did before
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE | cv2.IMREAD_IGNORE_ORIENTATION)
+    if img is None:
+        raise ValueError("cannot decode image")
+    return img
+
+def enhance_image_opencv(gray):
+    denoised = cv2.fastNlMeansDenoising(gray, h=10)
+    thresh = cv2.adaptiveThreshold(denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 29, 17)
+    return cv2.filter2D(thresh, -1, SHARPEN_KERNEL)
+
+def resize_gray(img, width, height):
+    # INTER_AREA is the anti-aliased choice for shrinking; scans rarely need enlarging
+    interpolation = cv2.INTER_AREA if width < img.shape[1] else cv2.INTER_LANCZOS4
+    return cv2.resize(img, (width, height), interpolation=interpolation)
+
+def natural_sort_key(s):
+    return [int(text) if text.isdigit() else text.lower() for text in re.split(r'(\d+)', s)]
+
+# The parsers below are memoized on their input string, so they return
+# immutable tuples, frozensets and read-only mappings shared by all sessions.
+@lru_cache(maxsize=256)
+def parse_qnos(qnos_str):
+    q_list = []
+    if not qnos_str:
+        return tuple(q_list)
+    for part in qnos_str.split(','):
+        part = part.strip()
+        if '-' in part:
+            start, end = map(int, part.split('-'))
+            q_list.extend(range(start, end + 1))
+        elif part:
+            q_list.append(int(part))
+    return tuple(q_list)
+
+@lru_cache(maxsize=256)
+def parse_multi_numbering(input_str):
+    numbering_map = {}
+    if not input_str:
+        return MappingProxyType(numbering_map)
+    for part in input_str.split(','):
+        part = part.strip()
+        if ':' in part:
+            img_range, start_num = part.split(':')
+            try:
+                start_num = int(start_num)
+            except ValueError:
+                continue
+            if '-' in img_range:
+                start_idx, end_idx = map(int, img_range.split('-'))
+                for i, idx in enumerate(range(start_idx, end_idx + 1)):
+                    numbering_map[idx] = start_num + i
+            else:
+                idx = int(img_range)
+                numbering_map[idx] = start_num
+    return MappingProxyType(numbering_map)
+
+@lru_cache(maxsize=256)
+def parse_skip_images(skip_str):
+    skip_list = []
+    if not skip_str:
+        return frozenset(skip_list)
+    for part in skip_str.split(','):
+        part = part.strip()
+        if '-' in part:
+            start, end = map(int, part.split('-'))
+            skip_list.extend(range(start, end + 1))
+        elif part:
+            skip_list.append(int(part))
+    return frozenset(skip_list)
+
+def sanitize_filename(name):
+    cleaned_name = re.sub(r'[^À-῿Ⰰ-퟿豈-﷏\uFDF0-\uFFFD\w\s.-]', '_', name)
+    cleaned_name = re.sub(r'\s+', '_', cleaned_name)
+    cleaned_name = cleaned_name.strip('_')
+    if not cleaned_name:
+        return "untitled"
+    return cleaned_name
+
+@lru_cache(maxsize=64)
+def get_strip_mapping(strips):
+    # strips: tuple of (question range string, ratio) pairs, later pairs win
+    mapping = {}
+    for qnos_str, ratio in strips:
+        if qnos_str:
+            for q in parse_qnos(qnos_str):
+                mapping[q] = ratio
+    return MappingProxyType(mapping)
+
+@lru_cache(maxsize=None)
+def load_font_with_size(size):
+    try:
+        font_paths = [
+            "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+            "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
+            "arial.ttf",
+        ]
+        for font_path in font_paths:
+            try:
+                return ImageFont.truetype(font_path, size)
+            except:
+                continue
+        return ImageFont.load_default()
+    except:
+        return ImageFont.load_default()
+
+def _report(on_error, name, e):
+    if on_error is not None:
+        on_error(name, e)
+    else:
+        traceback.print_exc()
+
+# ------------------- NUMBERING -------------------
+def number_files(files, numbering_map, skip_list):
+    # Yields (question number, file_info) in natural filename order.
+    # Skipped images consume an image index but produce nothing.
+    image_index = 1
+    question_number_counter = 0
+
+    for file_info in sorted(files, key=lambda x: natural_sort_key(x['name'])):
+        question_number_to_display = None
+        if image_index in numbering_map:
+            question_number_to_display = numbering_map[image_index]
+        elif image_index not in skip_list:
+            question_number_counter += 1
+            question_number_to_display = question_number_counter
+        image_index += 1
+
+        if question_number_to_display is not None:
+            yield question_number_to_display, file_info
+
+def load_enhanced(file_info):
+    return enhance_image_opencv(decode_gray(file_info['bytes']))
+
+# ------------------- PDF GENERATION -------------------
+def _text_size(text, font, fallback):
+    try:
+        bbox = font.getbbox(text)
+        return bbox[2] - bbox[0], bbox[3] - bbox[1]
+    except:
+        return fallback
+
+@lru_cache(maxsize=None)
+def _watermark_overlay():
+    # Rotated semi-transparent watermark, identical on every page
+    watermark_font = load_font_with_size(800)
+    bbox = watermark_font.getbbox(WATERMARK_TEXT)
+    text_width = bbox[2] - bbox[0]
+    text_height = bbox[3] - bbox[1]
+
+    text_temp = Image.new('LA', (text_width, text_height), (0, 0))
+    draw_temp = ImageDraw.Draw(text_temp)
+    draw_temp.text((-bbox[0], -bbox[1]), WATERMARK_TEXT,
+                 font=watermark_font, fill=(0, WATERMARK_OPACITY))
+
+    return text_temp.rotate(WATERMARK_ANGLE, expand=1)
+
+class PdfLayout:
+    # Lays enhanced images out on A4 pages one at a time; finish() encodes the PDF
+    # into fp and returns the page count.
+    # Pages are uint8 arrays filled by slice assignment. Text is recorded per
+    # page and drawn when the page is handed to the encoder. Images passed to
+    # add() are never modified.
+
+    def __init__(self, fp, exam_type, exam_date, alignment="Center", strip_mapping=None):
+        self.fp = fp
+        self.alignment = alignment
+        self.strip_mapping = strip_mapping or {}
+        self.pages = []
+        self.question_font = load_font_with_size(40)
+        self._new_page()
+
+        header_font = load_font_with_size(60)
+        subheader_font = load_font_with_size(45)
+        y_offset = TOP_MARGIN_FIRST_PAGE
+
+        text_width, text_height = _text_size(COLLEGE_NAME, header_font, (None, 70))
+        x = A4_WIDTH // 4 if text_width is None else (A4_WIDTH - text_width) // 2
+        self.texts.append(((x, y_offset), COLLEGE_NAME, header_font))
+        y_offset += text_height + 10
+
+        combined_header = f"{exam_type}   {exam_date}"
+        text_width, text_height = _text_size(combined_header, subheader_font, (None, 20))
+        x = A4_WIDTH // 3 if text_width is None else (A4_WIDTH - text_width) // 2
+        self.texts.append(((x, y_offset), combined_header, subheader_font))
+        y_offset += text_height + 40
+
+        self.y_offset = y_offset
+
+    def _new_page(self):
+        self.current_page = np.full((A4_HEIGHT, A4_WIDTH), 255, np.uint8)
+        self.texts = []
+        self.pages.append((self.current_page, self.texts))
+
+    def add(self, img, question_number_to_display):
+        # Scale image based on alignment choice
+        if self.alignment == "Center":
+            # Scale to 90% of page width for centered images
+            scale = (A4_WIDTH * 0.9) / img.shape[1]
+        else:  # Left or Right alignment
+            # Use smaller scale to leave space on sides
+            scale = ((A4_WIDTH - SIDE_MARGIN) * 0.9) / img.shape[1]
+
+        img_to_process = resize_gray(img, int(img.shape[1] * scale), int(img.shape[0] * scale))
+        width = img_to_process.shape[1]
+        is_first_part = True
+
+        # Place image based on alignment choice
+        if self.alignment == "Center":
+            x_position = (A4_WIDTH - width) // 2
+        elif self.alignment == "Left":
+            x_position = SIDE_MARGIN
+        else:  # Right alignment
+            x_position = A4_WIDTH - width - SIDE_MARGIN
+
+        fraction = self.strip_mapping.get(question_number_to_display, None)
+        strip_width = int(width * fraction) if fraction is not None else 0
+
+        while img_to_process is not None:
+            remaining_space = A4_HEIGHT - self.y_offset - BOTTOM_MARGIN
+            if remaining_space <= 0:
+                self._new_page()
+                self.y_offset = TOP_MARGIN_SUBSEQUENT_PAGES
+                continue
+            if img_to_process.shape[0] <= remaining_space:
+                img_part = img_to_process
+                img_to_process = None
+            else:
+                # Views, not copies: the two parts share OVERLAP_PIXELS rows
+                split_height = remaining_space + OVERLAP_PIXELS
+                img_part = img_to_process[:split_height]
+                img_to_process = img_to_process[split_height - OVERLAP_PIXELS:]
+
+            part_height = img_part.shape[0]
+            region = self.current_page[self.y_offset:self.y_offset + part_height,
+                                       x_position:x_position + width]
+            region[:] = img_part
+
+            if fraction is not None:
+                region[:, :strip_width + 1] = 255
+
+            if is_first_part and question_number_to_display is not None:
+                label = f"{question_number_to_display}."
+                text_x = 10
+                if fraction is not None:
+                    text_width_q, _ = _text_size(label, self.question_font, (None, None))
+                    if text_width_q is not None:
+                        text_x = strip_width - text_width_q - 10
+                self.texts.append(((x_position + text_x, self.y_offset + 10), label, self.question_font))
+                is_first_part = False
+
+            self.y_offset += part_height + GAP_BETWEEN_IMAGES
+
+            if img_to_process is not None:
+                self._new_page()
+                self.y_offset = TOP_MARGIN_SUBSEQUENT_PAGES
+
+    def _finish_page(self, i, page_array, texts):
+        # Encoder boundary: the only place a page becomes a PIL image
+        page = Image.fromarray(page_array)
+        draw_page = ImageDraw.Draw(page)
+        for xy, text, font in texts:
+            draw_page.text(xy, text, fill=0, font=font)
+
+        try:
+            rotated_text = _watermark_overlay()
+            rotated_width, rotated_height = rotated_text.size
+
+            paste_x = (A4_WIDTH - rotated_width) // 2
+            paste_y = (A4_HEIGHT - rotated_height) // 2
+
+            page.paste(0, (paste_x, paste_y), rotated_text.getchannel('A'))
+        except:
+            draw_page.text((A4_WIDTH//3, A4_HEIGHT//2), WATERMARK_TEXT,
+                         fill=200, font=load_font_with_size(800))
+
+        if i > 0:
+            page_number_font = load_font_with_size(30)
+            page_number_text = str(i + 1)
+            text_width_pn, text_height_pn = _text_size(page_number_text, page_number_font, (None, None))
+            if text_width_pn is not None:
+                page_num_x = (A4_WIDTH - text_width_pn) // 2
+                page_num_y = A4_HEIGHT - BOTTOM_MARGIN + (BOTTOM_MARGIN - text_height_pn) // 2 - 20
+            else:
+                page_num_x, page_num_y = A4_WIDTH//2, A4_HEIGHT - 50
+            draw_page.text((page_num_x, page_num_y), page_number_text,
+                         font=page_number_font, fill=0)
+
+        return page
+
+    def finish(self):
+        # Release each page array as soon as its PIL copy exists
+        pages, self.pages = self.pages, []
+        pdf_pages = []
+        for i in range(len(pages)):
+            page, texts = pages[i]
+            pages[i] = None
+            pdf_pages.append(self._finish_page(i, page, texts))
+
+        pdf_pages[0].save(self.fp, format='PDF', save_all=True,
+                         append_images=pdf_pages[1:], resolution=300.0)
+
+        return len(pdf_pages)
+
+# ------------------- IMAGE ARCHIVE -------------------
+class ZipExport:
+    # Writes one PNG per question into a ZIP in fp; finish() returns the image count
+
+    def __init__(self, fp, strip_mapping=None):
+        self.strip_mapping = strip_mapping or {}
+        self.zipf = zipfile.ZipFile(fp, 'w', zipfile.ZIP_DEFLATED)
+        self.processed_count = 0
+
+    def add(self, img, question_number_to_display):
+        if not question_number_to_display:
+            return
+
+        # Apply strip cropping (a column view, no copy)
+        strip_fraction = self.strip_mapping.get(question_number_to_display)
+        if strip_fraction is not None and strip_fraction > 0:
+            original_width = img.shape[1]
+            crop_width = int(original_width * (1 - strip_fraction))
+            img = img[:, original_width - crop_width:]
+
+        # Save processed image straight into the archive
+        ok, png = cv2.imencode('.png', img)
+        if not ok:
+            raise ValueError("PNG encoding failed")
+        self.zipf.writestr(f"Q{question_number_to_display:03d}.png", png.tobytes())
+        self.processed_count += 1
+
+    def finish(self):
+        self.zipf.close()
+        return self.processed_count
+
+# ------------------- RENDER GRAPH -------------------
+# One render() call decodes, enhances and numbers every image once, then fans
+# each enhanced image out to all requested outputs. Every output is written to
+# its own binary file object (an open file or io.BytesIO).
+OUTPUT_TYPES = {'pdf': PdfLayout, 'zip': ZipExport}
+
+def pdf_output(fp, exam_type, exam_date, alignment="Center", strip_mapping=None):
+    return {'type': 'pdf', 'fp': fp, 'exam_type': exam_type, 'exam_date': exam_date,
+            'alignment': alignment, 'strip_mapping': strip_mapping}
+
+def zip_output(fp, strip_mapping=None):
+    return {'type': 'zip', 'fp': fp, 'strip_mapping': strip_mapping}
+
+def render(files, outputs, numbering_map, skip_list, on_error=None, load=load_enhanced):
+    # Returns the page / image count of each output, in the same order.
+    # load(file_info) supplies the enhanced image; callers that enhance ahead
+    # of time (see watch_folder.py) pass their own.
+    sinks = []
+    for spec in outputs:
+        options = {k: v for k, v in spec.items() if k != 'type'}
+        sinks.append(OUTPUT_TYPES[spec['type']](**options))
+
+    for question_number_to_display, file_info in number_files(files, numbering_map, skip_list):
+        try:
+            img = load(file_info)
+        except Exception as e:
+            _report(on_error, file_info['name'], e)
+            continue
+        for sink in sinks:
+            try:
+                sink.add(img, question_number_to_display)
+            except Exception as e:
+                _report(on_error, file_info['name'], e)
+
+    return [sink.finish() for sink in sinks]
@@ -0,0 +1,122 @@
+import os, json, time, shutil, hashlib, tempfile
+from contextlib import contextmanager
+
+# Generated PDFs and ZIPs live on disk, one directory per result key, instead
+# of being held as bytes in st.session_state. Entries expire RESULT_TTL seconds
+# after they were last used.
+
+RESULT_DIR = os.path.join(tempfile.gettempdir(), "lfjc_results")
+RESULT_TTL = 60 * 60
+CLEANUP_INTERVAL = 5 * 60
+STALE_TEMP_AGE = 24 * 60 * 60  # temp dirs left behind by a crashed render
+
+RESULT_FILE = "result"
+META_FILE = "meta.json"
+
+
+def result_key(*parts):
+    # Stable key for a result; parts must have a deterministic repr
+    return hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+
+
+class ResultStore:
+    def __init__(self, root=None, ttl=RESULT_TTL):
+        self.root = root or RESULT_DIR  # looked up at call time so RESULT_DIR can be redirected
+        self.ttl = ttl
+        self._last_cleanup = 0
+        self._writing = set()  # temp dirs of results still being rendered
+        os.makedirs(self.root, exist_ok=True)
+
+    def _dir(self, key):
+        return os.path.join(self.root, key)
+
+    def path(self, key):
+        return os.path.join(self._dir(key), RESULT_FILE)
+
+    def lookup(self, key):
+        # Returns the stored metadata, or None if the result is missing or expired
+        meta_path = os.path.join(self._dir(key), META_FILE)
+        try:
+            if time.time() - os.path.getmtime(meta_path) > self.ttl:
+                return None
+            with open(meta_path) as f:
+                meta = json.load(f)
+            os.utime(meta_path)  # using a result extends its lifetime
+        except (OSError, ValueError):
+            return None
+        return meta
+
+    @contextmanager
+    def create(self, key, **meta):
+        # Yields (fp, meta); the result becomes visible only if the block succeeds
+        self.cleanup()
+        tmp_dir = tempfile.mkdtemp(prefix=f".{key}-", dir=self.root)
+        self._writing.add(os.path.basename(tmp_dir))
+        try:
+            with open(os.path.join(tmp_dir, RESULT_FILE), 'wb') as fp:
+                yield fp, meta
+            meta['size'] = os.path.getsize(os.path.join(tmp_dir, RESULT_FILE))
+            with open(os.path.join(tmp_dir, META_FILE), 'w') as f:
+                json.dump(meta, f)
+            # Only an expired (or half-deleted) entry is replaced. A live one may
+            # back another session's download button; os.replace onto its
+            # non-empty directory fails and the existing result is kept.
+            if self.lookup(key) is None:
+                shutil.rmtree(self._dir(key), ignore_errors=True)
+            try:
+                os.replace(tmp_dir, self._dir(key))
+            except OSError:
+                pass  # another session stored the same result first
+        finally:
+            self._writing.discard(os.path.basename(tmp_dir))
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def read(self, key):
+        # Reading a result extends its lifetime, like lookup()
+        os.utime(os.path.join(self._dir(key), META_FILE))
+        with open(self.path(key), 'rb') as f:
+            return f.read()
+
+    def reader(self, key, regenerate=None):
+        # Zero-argument callable for st.download_button(data=...): the file is
+        # only read when the user actually clicks download. If the result was
+        # cleaned up in the meantime, regenerate() is called to store it again.
+        def read():
+            try:
+                return self.read(key)
+            except FileNotFoundError:
+                if regenerate is None:
+                    raise FileNotFoundError("This result has expired. Please generate it again.")
+            try:
+                regenerate()
+                return self.read(key)
+            except Exception as e:
+                raise RuntimeError("This result has expired and could not be regenerated. "
+                                   "Please generate it again.") from e
+        return read
+
+    def cleanup(self, force=False):
+        now = time.time()
+        if not force and now - self._last_cleanup < CLEANUP_INTERVAL:
+            return
+        self._last_cleanup = now
+        for name in os.listdir(self.root):
+            entry = os.path.join(self.root, name)
+            try:
+                if name.startswith('.'):
+                    # A temp dir's mtime doesn't move while its result is being
+                    # written, and a large queue can render for longer than the
+                    # TTL, so only long-abandoned ones are removed
+                    if name in self._writing:
+                        continue
+                    max_age = STALE_TEMP_AGE
+                    stamp = os.path.getmtime(entry)
+                else:
+                    # Results are judged by their metadata, half-deleted ones by the dir
+                    max_age = self.ttl
+                    meta_path = os.path.join(entry, META_FILE)
+                    stamp = os.path.getmtime(meta_path if os.path.exists(meta_path) else entry)
+            except OSError:
+                continue
+            if now - stamp > max_age:
+                shutil.rmtree(entry, ignore_errors=True)
@@ -0,0 +1,184 @@
+import os, sys, time, shutil, argparse, tempfile, traceback
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+import cv2
+from processing import (
+    decode_gray, enhance_image_opencv, get_strip_mapping, parse_multi_numbering,
+    parse_skip_images, pdf_output, render, zip_output,
+)
+
+# Hot-folder mode: watches the folder the scanner writes into and enhances each
+# sheet on a background pool as soon as it has finished arriving. Enhanced
+# sheets are cached as PNG files, so finalising the PDF only has to lay out and
+# encode them.
+#
+#   python watch_folder.py /mnt/scans --exam-type "Semester I - Physics" \
+#       --exam-date 15-01-2024 --output physics.pdf --idle 120
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+POLL_INTERVAL = 2.0
+
+
+class HotFolder:
+    def __init__(self, scan_dir, cache_dir, workers=None):
+        self.scan_dir = scan_dir
+        self.cache_dir = cache_dir
+        self.pool = ThreadPoolExecutor(workers or os.cpu_count())  # OpenCV releases the GIL
+        self._seen = {}   # name -> (size, mtime_ns) from the previous poll
+        self.jobs = {}    # name -> (size, mtime_ns) it was submitted with, future
+
+    def poll(self, final=False):
+        # Submits files whose size and mtime held still since the last poll, i.e.
+        # the scanner has finished writing them. final=True takes everything.
+        submitted = 0
+        current = {}
+        with os.scandir(self.scan_dir) as entries:
+            for entry in entries:
+                if not entry.is_file() or not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                stat = entry.stat()
+                signature = (stat.st_size, stat.st_mtime_ns)
+                current[entry.name] = signature
+                if stat.st_size == 0 or not (final or self._seen.get(entry.name) == signature):
+                    continue
+                job = self.jobs.get(entry.name)
+                if job is None or job[0] != signature:
+                    if job is not None:
+                        job[1].cancel()
+                    self.jobs[entry.name] = (signature, self.pool.submit(self._enhance, entry.name, signature))
+                    submitted += 1
+        # Sheets removed from the folder (misfeeds, duplicates) leave the run
+        for name in [name for name in self.jobs if name not in current]:
+            self.jobs.pop(name)[1].cancel()
+        self._seen = current
+        return submitted
+
+    def _cache_path(self, name, signature):
+        # The scan's size and mtime are part of the name, so a rescan never
+        # matches an entry made from an earlier (or partly written) version,
+        # whatever the file server's clock says
+        size, mtime_ns = signature
+        return os.path.join(self.cache_dir, f"{name}.{size}-{mtime_ns}.enhanced.png")
+
+    def _enhance(self, name, signature):
+        cache_path = self._cache_path(name, signature)
+        # An existing entry survives restarts of the watcher
+        if not os.path.exists(cache_path):
+            with open(os.path.join(self.scan_dir, name), 'rb') as f:
+                enhanced = enhance_image_opencv(decode_gray(f.read()))
+            fd, tmp_path = tempfile.mkstemp(suffix=".png", dir=self.cache_dir)
+            os.close(fd)
+            try:
+                if not cv2.imwrite(tmp_path, enhanced):
+                    raise OSError(f"cannot write {tmp_path}")
+                os.replace(tmp_path, cache_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            print(f"enhanced {name}", flush=True)
+        return cache_path
+
+    def busy(self):
+        return any(not future.done() for _, future in self.jobs.values())
+
+    def load(self, file_info):
+        # render() loader: waits for the background job, then reads the cached result
+        _, future = self.jobs[file_info['name']]
+        img = cv2.imread(future.result(), cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            raise ValueError("cannot read enhanced image")
+        return img
+
+    def files(self):
+        return [{'name': name} for name in self.jobs]
+
+
+def parse_strip(value):
+    # "1-5=1/10" or "1-5=0.1"
+    qnos, _, ratio = value.partition('=')
+    try:
+        return qnos.strip(), float(Fraction(ratio.strip()))
+    except (ValueError, ZeroDivisionError):
+        raise argparse.ArgumentTypeError(f"expected RANGE=RATIO, got {value!r}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Enhance scans as they arrive, then build the PDF.")
+    parser.add_argument("scan_dir", help="folder the scanner writes into")
+    parser.add_argument("--exam-type", required=True)
+    parser.add_argument("--exam-date", required=True)
+    parser.add_argument("--output", required=True, help="PDF file to write")
+    parser.add_argument("--zip", help="also write the per-question PNG archive here")
+    parser.add_argument("--alignment", choices=["Center", "Left", "Right"], default="Center")
+    parser.add_argument("--strip", action="append", type=parse_strip, default=[], metavar="RANGE=RATIO",
+                        help="strip cropping, e.g. 1-5=1/10 (repeatable)")
+    parser.add_argument("--numbering", default="", help="custom numbering ranges, e.g. 1-5:1, 6-10:41")
+    parser.add_argument("--skip", default="", help="images to skip from numbering, e.g. 2,4-5,7")
+    parser.add_argument("--idle", type=float, default=0,
+                        help="finalise after this many seconds without new scans (default: wait for Ctrl-C)")
+    parser.add_argument("--cache-dir", help="where enhanced sheets are kept (default: a temporary folder)")
+    parser.add_argument("--workers", type=int, help="background enhancement threads (default: CPU count)")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, help="seconds between folder scans")
+    args = parser.parse_args(argv)
+
+    # Validate the settings before waiting on the scanner
+    strip_mapping = get_strip_mapping(tuple(args.strip))
+    numbering_map = parse_multi_numbering(args.numbering)
+    skip_list = parse_skip_images(args.skip)
+
+    cache_dir = args.cache_dir or tempfile.mkdtemp(prefix="lfjc_enhanced_")
+    os.makedirs(cache_dir, exist_ok=True)
+    folder = HotFolder(args.scan_dir, cache_dir, args.workers)
+    try:
+        return watch(args, folder, strip_mapping, numbering_map, skip_list)
+    finally:
+        folder.pool.shutdown(cancel_futures=True)
+        if not args.cache_dir:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def watch(args, folder, strip_mapping, numbering_map, skip_list):
+    print(f"watching {args.scan_dir} (Ctrl-C to finalise)", flush=True)
+    last_activity = time.monotonic()
+    try:
+        while True:
+            if folder.poll() or folder.busy():
+                last_activity = time.monotonic()
+            if args.idle and folder.jobs and time.monotonic() - last_activity >= args.idle:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+
+    folder.poll(final=True)
+    files = folder.files()
+    if not files:
+        print("no scans found", file=sys.stderr)
+        return 1
+    print(f"finalising {len(files)} scans", flush=True)
+
+    def report(name, e):
+        print(f"Error processing {name}: {e}", file=sys.stderr)
+
+    with open(args.output, 'wb') as pdf_fp:
+        outputs = [pdf_output(pdf_fp, args.exam_type, args.exam_date, args.alignment, strip_mapping)]
+        zip_fp = open(args.zip, 'wb') if args.zip else None
+        try:
+            if zip_fp:
+                outputs.append(zip_output(zip_fp, strip_mapping))
+            counts = render(files, outputs, numbering_map, skip_list, on_error=report, load=folder.load)
+        finally:
+            if zip_fp:
+                zip_fp.close()
+
+    print(f"wrote {args.output} ({counts[0]} pages)")
+    if args.zip:
+        print(f"wrote {args.zip} ({counts[1]} images)")
+    return 0
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except Exception:
+        traceback.print_exc()
+        sys.exit(1)